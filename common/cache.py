@@ -0,0 +1,156 @@
+import functools
+import json
+import logging
+import time
+from threading import Lock
+from typing import Any, Optional
+
+from fastapi.encoders import jsonable_encoder
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """Small in-process key/value cache where every entry expires after `ttl` seconds.
+
+    Keys may be grouped under a `scope` prefix that clear() drops together.
+    Expired entries are swept on write at most once per `ttl`, and whenever the
+    cache is full. With `maxsize` set, the oldest entries are then dropped.
+    """
+
+    def __init__(self, ttl: int, maxsize: Optional[int] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = Lock()
+        self._next_sweep = time.monotonic() + ttl
+
+    def get(self, key: str, scope: str = "") -> Optional[Any]:
+        key = scope + key
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value: Any, scope: str = "") -> None:
+        key = scope + key
+        now = time.monotonic()
+        with self._lock:
+            full = self.maxsize is not None and len(self._data) >= self.maxsize
+            if full or now >= self._next_sweep:
+                self._sweep(now)
+            # Re-insert so entries stay in write order and the first is the oldest
+            self._data.pop(key, None)
+            if self.maxsize is not None:
+                while len(self._data) >= self.maxsize:
+                    self._data.pop(next(iter(self._data)), None)
+            self._data[key] = (now + self.ttl, value)
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries; the caller holds the lock"""
+        for key in [k for k, (expires_at, _) in self._data.items() if expires_at < now]:
+            self._data.pop(key, None)
+        self._next_sweep = now + self.ttl
+
+    def clear(self, scope: str = "") -> None:
+        """Drop every entry stored under scope"""
+        with self._lock:
+            for key in [k for k in self._data if k.startswith(scope)]:
+                self._data.pop(key, None)
+
+
+# Keep a slow or unreachable Redis from stalling request handlers for long
+REDIS_TIMEOUT = 0.5  # seconds
+
+
+class RedisCache:
+    """Same interface as TTLCache, backed by Redis so all workers share entries.
+
+    Each scope has a generation counter that is part of its keys; clear()
+    bumps the counter so the old keys are never read again and expire on
+    their own. Every call is a constant number of round trips.
+
+    Values are stored as JSON. Redis errors are logged and treated as a cache miss.
+    """
+
+    def __init__(self, url: str, ttl: int, prefix: str = "nudge:"):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._errors = redis.RedisError
+        self._redis = redis.Redis.from_url(
+            url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT
+        )
+
+    def _key(self, key: str, scope: str) -> str:
+        generation = self._redis.get(f"{self.prefix}gen:{scope}") or 0
+        return f"{self.prefix}{scope}{int(generation)}:{key}"
+
+    def get(self, key: str, scope: str = "") -> Optional[Any]:
+        try:
+            raw = self._redis.get(self._key(key, scope))
+        except self._errors:
+            logger.warning("Redis cache read failed", exc_info=True)
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, scope: str = "") -> None:
+        try:
+            self._redis.set(self._key(key, scope), json.dumps(value), ex=self.ttl)
+        except self._errors:
+            logger.warning("Redis cache write failed", exc_info=True)
+
+    def clear(self, scope: str = "") -> None:
+        """Drop every entry stored under scope"""
+        try:
+            self._redis.incr(f"{self.prefix}gen:{scope}")
+        except self._errors:
+            logger.warning("Redis cache clear failed", exc_info=True)
+
+
+def make_cache(ttl: int):
+    """Use Redis when REDIS_URL is configured, otherwise a bounded in-process cache"""
+    if settings.REDIS_URL:
+        return RedisCache(settings.REDIS_URL, ttl)
+    return TTLCache(ttl, maxsize=settings.CACHE_MAXSIZE)
+
+
+# Per-user dashboard and report aggregates, cleared whenever the user's
+# transactions, budgets or categories change
+dashboard_cache = make_cache(settings.DASHBOARD_CACHE_TTL)
+
+
+def clear_dashboard_cache(user_id: int) -> None:
+    dashboard_cache.clear(f"dashboard:{user_id}:")
+
+
+def cached_per_user(cache, namespace: str):
+    """Cache an endpoint's JSON response per user and query parameters.
+
+    The endpoint must take `current_user`; `db` is left out of the key.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            params = sorted(
+                (name, str(value)) for name, value in kwargs.items()
+                if name not in ("db", "current_user")
+            )
+            scope = f"{namespace}:{kwargs['current_user'].id}:"
+            key = f"{func.__name__}:{params}"
+            cached = cache.get(key, scope)
+            if cached is not None:
+                return cached
+
+            response = jsonable_encoder(await func(*args, **kwargs))
+            cache.set(key, response, scope)
+            return response
+        return wrapper
+    return decorator
\ No newline at end of file
@@ -0,0 +1,19 @@
+from datetime import datetime, timezone
+
+
+def month_bounds(year: int, month: int) -> tuple:
+    """Return the [start, end) datetimes covering a calendar month"""
+    start_date = datetime(year, month, 1)
+
+    # End date is the first day of the following month
+    if month == 12:
+        end_date = datetime(year + 1, 1, 1)
+    else:
+        end_date = datetime(year, month + 1, 1)
+
+    return start_date, end_date
+
+
+def utc_now() -> datetime:
+    """Current UTC time as a naive datetime, matching the naive DateTime columns"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -1,20 +1,84 @@
+import logging
+
 from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, raiseload
 from config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+__all__ = ["engine", "SessionLocal", "Base", "get_db", "strict_loading", "create_missing_indexes", "create_schema"]
+
+logger = logging.getLogger(__name__)
+
+DATABASE_URL = settings.DATABASE_URL
+
+# Fix if Railway provides postgres://
+if DATABASE_URL.startswith("postgres://"):
+    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+if "sqlite" in DATABASE_URL:
+    engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False}
+    )
+else:
+    # Split the connection budget between worker processes
+    connections_per_worker = max(1, settings.DB_MAX_CONNECTIONS // settings.WEB_CONCURRENCY)
+    pool_size = min(settings.DB_POOL_SIZE, connections_per_worker)
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=pool_size,
+        max_overflow=min(settings.DB_MAX_OVERFLOW, connections_per_worker - pool_size),
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=True,  # important for Railway idle connections
+    )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
 def get_db():
+    """Yield a session for the current request.
+
+    FastAPI caches dependencies per request, so the handler and
+    get_current_user share this one session.
+    """
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def strict_loading() -> tuple:
+    """Loader options that turn stray lazy loads into errors when STRICT_LOADING is on"""
+    return (raiseload("*"),) if settings.STRICT_LOADING else ()
+
+
+def create_missing_indexes() -> None:
+    """Create model indexes that tables created by an older schema lack.
+
+    create_all skips tables that already exist along with their indexes,
+    so indexes added to the models later are created here one by one.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except IntegrityError:
+                # Existing rows already violate a unique index; the routers'
+                # own duplicate checks still apply until the data is cleaned up
+                logger.warning("Could not create unique index %s: duplicate rows exist", index.name)
+
+
+def create_schema() -> None:
+    """Create missing tables and indexes for every model.
+
+    Run it from one process only: concurrent CREATE TABLE/INDEX can race on
+    PostgreSQL. gunicorn_conf.py calls it once in the master before forking.
+    """
+    import models  # noqa: F401 -- registers the tables on Base.metadata
+
+    Base.metadata.create_all(bind=engine)
+    create_missing_indexes()
@@ -0,0 +1,57 @@
+# Production server settings: gunicorn -c gunicorn_conf.py main:app
+#
+# Each worker is a uvicorn event loop; with uvicorn[standard] installed it
+# picks uvloop and httptools automatically.
+#
+# Every worker opens its own database pool. The app splits DB_MAX_CONNECTIONS
+# (default 80) between WEB_CONCURRENCY workers, so workers x (DB_POOL_SIZE +
+# DB_MAX_OVERFLOW) never exceeds it; raise DB_MAX_CONNECTIONS only together
+# with the server's max_connections.
+#
+# Workers keep their own in-process caches, so more than one worker requires
+# REDIS_URL to share the dashboard and category caches and their invalidation.
+# Without REDIS_URL in the environment the default is a single worker.
+#
+# Tables and indexes are created once in the master (on_starting) rather than
+# by every worker at once, since concurrent DDL can race on PostgreSQL.
+import math
+import os
+
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring cpusets and cgroup CPU quotas"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        # sched_getaffinity is Linux-only
+        cpus = os.cpu_count() or 1
+    try:
+        # cgroup v2, e.g. "200000 100000" for a 2 CPU container limit
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+default_workers = min(available_cpus(), 4) if os.getenv("REDIS_URL") else 1
+workers = int(os.getenv("WEB_CONCURRENCY", default_workers))
+worker_class = "uvicorn.workers.UvicornWorker"
+keepalive = 5
+
+# Workers read WEB_CONCURRENCY from settings to size their pools, and skip
+# the schema setup that on_starting has already done
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["CREATE_SCHEMA_ON_STARTUP"] = "false"
+
+
+def on_starting(server):
+    """Create the schema once, before any worker is forked"""
+    from database import create_schema, engine
+
+    create_schema()
+    # Workers fork from this process; they must not inherit its connections
+    engine.dispose()
@@ -1,15 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.formparsers import MultiPartParser
 from contextlib import asynccontextmanager
+import os
 
-from database import engine, Base
+from database import create_schema
 from routers import auth, transactions, categories, budgets, reports, dashboard, users
 from config import settings
 
+# Keep uploads up to MAX_FILE_SIZE in memory, so they are written to disk once
+# (to their destination) instead of first being spooled to a temp file
+MultiPartParser.max_file_size = settings.MAX_FILE_SIZE
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Create tables
-    Base.metadata.create_all(bind=engine)
+    # In-process caches are only invalidated in the worker that handled the write
+    if settings.WEB_CONCURRENCY > 1 and not settings.REDIS_URL:
+        raise RuntimeError("REDIS_URL must be set when running more than one worker")
+
+    # Startup: Create tables, any indexes they are missing and the upload directory
+    if settings.CREATE_SCHEMA_ON_STARTUP:
+        create_schema()
+    os.makedirs(users.PROFILE_PICTURE_DIR, exist_ok=True)
     yield
     # Shutdown: cleanup if needed
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Enum, Text, Index, func, text
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 import enum
@@ -13,6 +13,9 @@ from common.enum import TransactionTypeEnum
 #     EXPENSE = "EXPENSE"
 #
 
+# Shared native enum type; the name matches the type already created in Postgres
+transaction_type_enum = Enum(TransactionTypeEnum, name="transactiontypeenum", native_enum=True)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -23,8 +26,10 @@ class User(Base):
     full_name = Column(String, nullable=True)
     profile_picture = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # default= sends now() in the INSERT itself, so tables created before the
+    # server defaults existed (create_all never alters them) still get stamped
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
 
     # Relationships
     transactions = relationship("Transaction", back_populates="user", cascade="all, delete-orphan")
@@ -44,13 +49,16 @@ class RefreshToken(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     expires_at = Column(DateTime, nullable=False)
     is_revoked = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
 
     user = relationship("User", back_populates="refresh_tokens")
 
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (
+        Index("ix_cat_user_type_name", "user_id", "transaction_type", "name", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -58,9 +66,9 @@ class Category(Base):
     icon = Column(String, nullable=True)
     color = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    transaction_type = Column(Enum(TransactionTypeEnum), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    transaction_type = Column(transaction_type_enum, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", back_populates="categories")
     transactions = relationship("Transaction", back_populates="category")
@@ -74,7 +82,7 @@ class CustomTransactionType(Base):
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
 
     user = relationship("User", back_populates="custom_transaction_types")
     transactions = relationship("Transaction", back_populates="custom_type")
@@ -82,11 +90,19 @@ class CustomTransactionType(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Newest-first listing: list_transactions, recent dashboard rows, CSV export
+        Index("ix_tx_user_date", "user_id", text("transaction_date DESC")),
+        # Per-type totals and ranges: dashboard, reports, budget spent
+        Index("ix_tx_user_type_date", "user_id", "transaction_type", "transaction_date"),
+        # Per-category budget spent and category reports
+        Index("ix_tx_user_cat_date", "user_id", "category_id", "transaction_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
     description = Column(String, nullable=True)
-    transaction_type = Column(Enum(TransactionTypeEnum), nullable=False)
+    transaction_type = Column(transaction_type_enum, nullable=False)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     custom_type_id = Column(Integer, ForeignKey("custom_transaction_types.id"), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -96,15 +112,8 @@ class Transaction(Base):
         default=lambda: datetime.now(timezone.utc)
     )
     notes = Column(Text, nullable=True)
-    created_at = Column(
-        DateTime(timezone=True),
-        default=lambda: datetime.now(timezone.utc)
-    )
-    updated_at = Column(
-        DateTime(timezone=True),
-        default=lambda: datetime.now(timezone.utc),
-        onupdate=lambda: datetime.now(timezone.utc)
-    )
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
     user = relationship("User", back_populates="transactions")
     category = relationship("Category", back_populates="transactions")
     custom_type = relationship("CustomTransactionType", back_populates="transactions")
@@ -112,6 +121,23 @@ class Transaction(Base):
 
 class Budget(Base):
     __tablename__ = "budgets"
+    __table_args__ = (
+        Index("ix_budget_user_year_month", "user_id", "year", "month"),
+        # One budget per category and period; NULLs never collide in a plain
+        # unique index, so budgets without a category get their own index
+        Index(
+            "uq_budget_user_cat_period", "user_id", "category_id", "month", "year",
+            unique=True,
+            postgresql_where=text("category_id IS NOT NULL"),
+            sqlite_where=text("category_id IS NOT NULL")
+        ),
+        Index(
+            "uq_budget_user_nullcat_period", "user_id", "month", "year",
+            unique=True,
+            postgresql_where=text("category_id IS NULL"),
+            sqlite_where=text("category_id IS NULL")
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
@@ -121,8 +147,8 @@ class Budget(Base):
     month = Column(Integer, nullable=False)  # 1-12
     year = Column(Integer, nullable=False)
     alert_threshold = Column(Float, default=80.0)  # Alert when 80% spent
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", back_populates="budgets")
     category = relationship("Category", back_populates="budgets")
@@ -138,7 +164,7 @@ class UserSettings(Base):
     notification_enabled = Column(Boolean, default=True)
     budget_alerts = Column(Boolean, default=True)
     theme = Column(String, default="light")
-    created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
 
     user = relationship("User", back_populates="settings")
\ No newline at end of file
@@ -1,52 +1,59 @@
-from typing import List
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy import exists, select, or_, bindparam, lambda_stmt
+from sqlalchemy.exc import IntegrityError
 from datetime import timedelta
 
 from database import get_db
 from models import User, UserSettings
 from schemas import UserRegister, UserLogin, Token, TokenRefresh, UserResponse, UsernameCheckResponse,UserName
 from security import (
-    hash_password, verify_password, create_access_token,
+    hash_password, verify_password, password_needs_rehash, create_access_token,
     create_refresh_token, verify_refresh_token, get_current_user
 )
-from config import settings
+from config import Settings, get_settings
 
 router = APIRouter()
 
-@router.get("/users", response_model=List[UserResponse])
-def get_users(db: Session = Depends(get_db)):
-    return db.query(User).all()
+# Built once; SQLAlchemy caches the compiled SQL for every login
+login_user_stmt = lambda_stmt(
+    lambda: select(User).where(
+        or_(
+            User.username == bindparam("username_or_email"),
+            User.email == bindparam("username_or_email")
+        )
+    )
+)
+
+# Unique indexes on users and the error each one means
+DUPLICATE_USER_DETAILS = {
+    "ix_users_username": "Username already registered",
+    "ix_users_email": "Email already registered",
+}
 
 
+def duplicate_user_detail(error: IntegrityError) -> Optional[str]:
+    """Detail for a violated users unique index, or None for any other integrity error"""
+    # PostgreSQL (psycopg2) reports the index name
+    constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+    if constraint is None:
+        # SQLite only names the column: "UNIQUE constraint failed: users.username"
+        message = str(error.orig)
+        prefix = "UNIQUE constraint failed: users."
+        if message.startswith(prefix):
+            constraint = f"ix_users_{message[len(prefix):]}"
+    return DUPLICATE_USER_DETAILS.get(constraint)
+
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserRegister, db: Session = Depends(get_db)):
     """Register a new user"""
-    # Check if username exists
-    if db.query(User).filter(User.username == user_data.username).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered"
-        )
-
-    # Check if email exists
-    if db.query(User).filter(User.email == user_data.email).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-
-    # Validate password length
-    if len(user_data.password) < settings.PASSWORD_MIN_LENGTH:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Password must be at least {settings.PASSWORD_MIN_LENGTH} characters"
-        )
-
-    # Create user
-    hashed_password = hash_password(user_data.password)
+    # Create user (password length is validated by UserRegister)
+    # Hashing is CPU-bound; keep it off the event loop
+    hashed_password = await run_in_threadpool(hash_password, user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -54,28 +61,39 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
         full_name=user_data.full_name
     )
 
-    db.add(new_user)
-    db.commit()
+    # Create user together with default settings in one transaction;
+    # the unique indexes on username/email reject duplicates
+    db.add_all([new_user, UserSettings(user=new_user)])
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        detail = duplicate_user_detail(e)
+        if detail is None:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail
+        )
     db.refresh(new_user)
 
-    # Create default user settings
-    user_settings = UserSettings(user_id=new_user.id)
-    db.add(user_settings)
-    db.commit()
-
     return new_user
 
 
 @router.post("/login", response_model=Token)
-async def login(login_data: UserLogin, db: Session = Depends(get_db)):
+async def login(
+        login_data: UserLogin,
+        db: Session = Depends(get_db),
+        settings: Settings = Depends(get_settings)
+):
     """Login user and return access and refresh tokens"""
     # Find user by username or email
-    user = db.query(User).filter(
-        (User.username == login_data.username_or_email) |
-        (User.email == login_data.username_or_email)
-    ).first()
+    user = db.execute(
+        login_user_stmt,
+        {"username_or_email": login_data.username_or_email}
+    ).scalars().first()
 
-    if not user or not verify_password(login_data.password, user.hashed_password):
+    if not user or not await run_in_threadpool(verify_password, login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username/email or password"
@@ -87,6 +105,11 @@ async def login(login_data: UserLogin, db: Session = Depends(get_db)):
             detail="User account is inactive"
         )
 
+    # Upgrade hashes made with older Argon2 parameters while the password is at hand;
+    # create_refresh_token below commits it
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await run_in_threadpool(hash_password, login_data.password)
+
     # Create tokens
     access_token = create_access_token(
         data={"sub": user.id},
@@ -103,7 +126,11 @@ async def login(login_data: UserLogin, db: Session = Depends(get_db)):
 
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db)):
+async def refresh_token(
+        token_data: TokenRefresh,
+        db: Session = Depends(get_db),
+        settings: Settings = Depends(get_settings)
+):
     """Refresh access token using refresh token"""
     user = verify_refresh_token(token_data.refresh_token, db)
 
@@ -134,12 +161,10 @@ def check_username(
     payload: UserName,
     db: Session = Depends(get_db)
 ):
-    user = (
-        db.query(User)
-        .filter(User.username == payload.name)
-        .first()
-    )
-    return {"exists": bool(user)}
+    username_exists = db.query(
+        exists().where(User.username == payload.name)
+    ).scalar()
+    return {"exists": username_exists}
 
 
 
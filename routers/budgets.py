@@ -1,26 +1,23 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, extract
+from sqlalchemy import and_, or_, func, extract, exists
+from sqlalchemy.exc import IntegrityError
+from collections import defaultdict
 from typing import List, Optional
-from datetime import datetime
 
 from database import get_db
 from models import Budget, User, Category, Transaction
 from schemas import BudgetCreate, BudgetUpdate, BudgetResponse
 from security import get_current_user
 from common.enum import TransactionTypeEnum
+from common.cache import clear_dashboard_cache
+from common.dates import month_bounds
 router = APIRouter()
 
 
 def calculate_budget_spent(budget: Budget, db: Session) -> dict:
     """Calculate spent amount and remaining for a budget"""
-    start_date = datetime(budget.year, budget.month, 1)
-
-    # Calculate end date (last day of month)
-    if budget.month == 12:
-        end_date = datetime(budget.year + 1, 1, 1)
-    else:
-        end_date = datetime(budget.year, budget.month + 1, 1)
+    start_date, end_date = month_bounds(budget.year, budget.month)
 
     # Query to get total spent
     query = db.query(func.sum(Transaction.amount)).filter(
@@ -36,6 +33,11 @@ def calculate_budget_spent(budget: Budget, db: Session) -> dict:
         query = query.filter(Transaction.category_id == budget.category_id)
 
     spent = query.scalar() or 0.0
+    return budget_spent_info(budget, spent)
+
+
+def budget_spent_info(budget: Budget, spent: float) -> dict:
+    """Build the spent/remaining/percentage figures for a budget"""
     remaining = budget.amount - spent
     percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
 
@@ -46,6 +48,151 @@ def calculate_budget_spent(budget: Budget, db: Session) -> dict:
     }
 
 
+# Columns read by build_budget_response and calculate_budget_spent_bulk
+BUDGET_RESPONSE_COLUMNS = (
+    Budget.id, Budget.name, Budget.amount, Budget.category_id, Budget.user_id,
+    Budget.month, Budget.year, Budget.alert_threshold, Budget.created_at
+)
+
+
+def build_budget_response(budget: Budget, budget_info: dict) -> BudgetResponse:
+    """Build a BudgetResponse from a budget (ORM object or column row) and its spent figures"""
+    # Values come straight from the database, so skip re-validation
+    return BudgetResponse.model_construct(
+        id=budget.id,
+        name=budget.name,
+        amount=budget.amount,
+        category_id=budget.category_id,
+        month=budget.month,
+        year=budget.year,
+        alert_threshold=budget.alert_threshold,
+        created_at=budget.created_at,
+        **budget_info
+    )
+
+
+def calculate_budget_spent_bulk(budgets: List[Budget], db: Session) -> dict:
+    """Calculate spent amounts for many budgets with a single grouped query.
+
+    Returns a dict mapping budget id to the same figures as calculate_budget_spent.
+    """
+    if not budgets:
+        return {}
+
+    txn_year = extract('year', Transaction.transaction_date)
+    txn_month = extract('month', Transaction.transaction_date)
+
+    # Filter on date ranges so the transaction_date indexes stay usable;
+    # extract() is only used to bucket the matching rows
+    period_filters = []
+    for year, month in {(b.year, b.month) for b in budgets}:
+        start_date, end_date = month_bounds(year, month)
+        period_filters.append(and_(
+            Transaction.transaction_date >= start_date,
+            Transaction.transaction_date < end_date
+        ))
+
+    rows = db.query(
+        Transaction.category_id,
+        txn_year,
+        txn_month,
+        func.sum(Transaction.amount)
+    ).filter(
+        Transaction.user_id == budgets[0].user_id,
+        Transaction.transaction_type == TransactionTypeEnum.EXPENSE,
+        or_(*period_filters)
+    ).group_by(
+        Transaction.category_id, txn_year, txn_month
+    ).all()
+
+    # Spent per (category_id, month, year); budgets without a category cover
+    # every expense in the period, so keep a per-period total as well
+    spent_by_key = defaultdict(float)
+    for category_id, year, month, total in rows:
+        if category_id is not None:
+            spent_by_key[(category_id, int(month), int(year))] += total or 0.0
+        spent_by_key[(None, int(month), int(year))] += total or 0.0
+
+    return {
+        budget.id: budget_spent_info(
+            budget,
+            spent_by_key.get((budget.category_id, budget.month, budget.year), 0.0)
+        )
+        for budget in budgets
+    }
+
+
+def ensure_category_owned(db: Session, user_id: int, category_id: int) -> None:
+    """404 unless the category exists and belongs to the user"""
+    category_owned = db.query(exists().where(
+        Category.id == category_id,
+        Category.user_id == user_id
+    )).scalar()
+    if not category_owned:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found"
+        )
+
+
+def ensure_budget_period_free(
+        db: Session,
+        user_id: int,
+        category_id: Optional[int],
+        month: int,
+        year: int,
+        exclude_id: Optional[int] = None
+) -> None:
+    """Reject a second budget for the same category and period.
+
+    Databases created before the unique period indexes may not have them,
+    so this check stays in front of commit_budget.
+    """
+    query = db.query(Budget.id).filter(
+        Budget.user_id == user_id,
+        Budget.category_id.is_(None) if category_id is None else Budget.category_id == category_id,
+        Budget.month == month,
+        Budget.year == year
+    )
+    if exclude_id is not None:
+        query = query.filter(Budget.id != exclude_id)
+
+    if db.query(query.exists()).scalar():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Budget already exists for this category and period"
+        )
+
+
+# Unique period indexes on budgets, by name (PostgreSQL reports it) and by the
+# column list SQLite reports instead
+BUDGET_PERIOD_INDEXES = [index for index in Budget.__table__.indexes if index.name.startswith("uq_budget_")]
+BUDGET_PERIOD_CONSTRAINTS = {index.name for index in BUDGET_PERIOD_INDEXES} | {
+    "UNIQUE constraint failed: " + ", ".join(f"budgets.{column.name}" for column in index.columns)
+    for index in BUDGET_PERIOD_INDEXES
+}
+
+
+def is_duplicate_budget(error: IntegrityError) -> bool:
+    """Whether an integrity error comes from one of the unique period indexes"""
+    constraint = getattr(getattr(error.orig, "diag", None), "constraint_name", None)
+    return (constraint or str(error.orig)) in BUDGET_PERIOD_CONSTRAINTS
+
+
+def commit_budget(db: Session) -> None:
+    """Commit budget changes, mapping the unique period indexes to a 400"""
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if not is_duplicate_budget(e):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Budget already exists for this category and period"
+        )
+
+
 @router.post("/", response_model=BudgetResponse, status_code=status.HTTP_201_CREATED)
 async def create_budget(
         budget_data: BudgetCreate,
@@ -55,29 +202,11 @@ async def create_budget(
     """Create a new budget"""
     # Validate category if provided
     if budget_data.category_id:
-        category = db.query(Category).filter(
-            Category.id == budget_data.category_id,
-            Category.user_id == current_user.id
-        ).first()
-        if not category:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Category not found"
-            )
-
-    # Check for duplicate budget
-    existing = db.query(Budget).filter(
-        Budget.user_id == current_user.id,
-        Budget.category_id == budget_data.category_id,
-        Budget.month == budget_data.month,
-        Budget.year == budget_data.year
-    ).first()
+        ensure_category_owned(db, current_user.id, budget_data.category_id)
 
-    if existing:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Budget already exists for this category and period"
-        )
+    ensure_budget_period_free(
+        db, current_user.id, budget_data.category_id, budget_data.month, budget_data.year
+    )
 
     budget = Budget(
         name=budget_data.name,
@@ -90,17 +219,13 @@ async def create_budget(
     )
 
     db.add(budget)
-    db.commit()
+    commit_budget(db)
     db.refresh(budget)
+    clear_dashboard_cache(current_user.id)
 
     # Calculate spent amount
     budget_info = calculate_budget_spent(budget, db)
-    response = BudgetResponse.from_orm(budget)
-    response.spent = budget_info["spent"]
-    response.remaining = budget_info["remaining"]
-    response.percentage_used = budget_info["percentage_used"]
-
-    return response
+    return build_budget_response(budget, budget_info)
 
 
 @router.get("/", response_model=List[BudgetResponse])
@@ -112,7 +237,9 @@ async def list_budgets(
         current_user: User = Depends(get_current_user)
 ):
     """List all budgets with optional filters"""
-    query = db.query(Budget).filter(Budget.user_id == current_user.id)
+    # Select just the columns BudgetResponse needs; plain rows skip ORM
+    # instance construction and identity-map bookkeeping
+    query = db.query(*BUDGET_RESPONSE_COLUMNS).filter(Budget.user_id == current_user.id)
 
     if month:
         query = query.filter(Budget.month == month)
@@ -123,17 +250,9 @@ async def list_budgets(
 
     budgets = query.order_by(Budget.year.desc(), Budget.month.desc()).all()
 
-    # Calculate spent for each budget
-    response = []
-    for budget in budgets:
-        budget_info = calculate_budget_spent(budget, db)
-        budget_response = BudgetResponse.from_orm(budget)
-        budget_response.spent = budget_info["spent"]
-        budget_response.remaining = budget_info["remaining"]
-        budget_response.percentage_used = budget_info["percentage_used"]
-        response.append(budget_response)
-
-    return response
+    # Calculate spent for all budgets in one query
+    spent_info = calculate_budget_spent_bulk(budgets, db)
+    return [build_budget_response(budget, spent_info[budget.id]) for budget in budgets]
 
 
 @router.get("/{budget_id}", response_model=BudgetResponse)
@@ -143,24 +262,16 @@ async def get_budget(
         current_user: User = Depends(get_current_user)
 ):
     """Get a specific budget"""
-    budget = db.query(Budget).filter(
-        Budget.id == budget_id,
-        Budget.user_id == current_user.id
-    ).first()
+    budget = db.get(Budget, budget_id)
 
-    if not budget:
+    if budget is None or budget.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Budget not found"
         )
 
     budget_info = calculate_budget_spent(budget, db)
-    response = BudgetResponse.from_orm(budget)
-    response.spent = budget_info["spent"]
-    response.remaining = budget_info["remaining"]
-    response.percentage_used = budget_info["percentage_used"]
-
-    return response
+    return build_budget_response(budget, budget_info)
 
 
 @router.put("/{budget_id}", response_model=BudgetResponse)
@@ -171,12 +282,9 @@ async def update_budget(
         current_user: User = Depends(get_current_user)
 ):
     """Update a budget"""
-    budget = db.query(Budget).filter(
-        Budget.id == budget_id,
-        Budget.user_id == current_user.id
-    ).first()
+    budget = db.get(Budget, budget_id)
 
-    if not budget:
+    if budget is None or budget.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Budget not found"
@@ -187,21 +295,22 @@ async def update_budget(
         budget.name = budget_data.name
     if budget_data.amount is not None:
         budget.amount = budget_data.amount
-    if budget_data.category_id is not None:
+    if budget_data.category_id is not None and budget_data.category_id != budget.category_id:
+        ensure_category_owned(db, current_user.id, budget_data.category_id)
+        ensure_budget_period_free(
+            db, current_user.id, budget_data.category_id, budget.month, budget.year,
+            exclude_id=budget.id
+        )
         budget.category_id = budget_data.category_id
     if budget_data.alert_threshold is not None:
         budget.alert_threshold = budget_data.alert_threshold
 
-    db.commit()
+    commit_budget(db)
     db.refresh(budget)
+    clear_dashboard_cache(current_user.id)
 
     budget_info = calculate_budget_spent(budget, db)
-    response = BudgetResponse.from_orm(budget)
-    response.spent = budget_info["spent"]
-    response.remaining = budget_info["remaining"]
-    response.percentage_used = budget_info["percentage_used"]
-
-    return response
+    return build_budget_response(budget, budget_info)
 
 
 @router.delete("/{budget_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -211,12 +320,9 @@ async def delete_budget(
         current_user: User = Depends(get_current_user)
 ):
     """Delete a budget"""
-    budget = db.query(Budget).filter(
-        Budget.id == budget_id,
-        Budget.user_id == current_user.id
-    ).first()
+    budget = db.get(Budget, budget_id)
 
-    if not budget:
+    if budget is None or budget.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Budget not found"
@@ -224,6 +330,7 @@ async def delete_budget(
 
     db.delete(budget)
     db.commit()
+    clear_dashboard_cache(current_user.id)
     return None
 
 
@@ -235,31 +342,55 @@ async def get_monthly_budget_overview(
         current_user: User = Depends(get_current_user)
 ):
     """Get monthly budget overview with all budgets and spending"""
-    budgets = db.query(Budget).filter(
+    start_date, end_date = month_bounds(year, month)
+
+    # One statement: per-budget spend via LEFT JOIN, period totals via window sums.
+    # Budgets without a category cover every expense in the period.
+    spent = func.coalesce(func.sum(Transaction.amount), 0.0)
+    rows = db.query(
+        Budget.id,
+        Budget.name,
+        Budget.category_id,
+        Budget.amount,
+        Budget.alert_threshold,
+        spent.label("spent"),
+        func.sum(Budget.amount).over().label("total_budgeted"),
+        func.sum(spent).over().label("total_spent")
+    ).outerjoin(
+        Transaction,
+        and_(
+            Transaction.user_id == Budget.user_id,
+            Transaction.transaction_type == TransactionTypeEnum.EXPENSE,
+            or_(Budget.category_id.is_(None), Transaction.category_id == Budget.category_id),
+            Transaction.transaction_date >= start_date,
+            Transaction.transaction_date < end_date
+        )
+    ).filter(
         Budget.user_id == current_user.id,
         Budget.month == month,
         Budget.year == year
-    ).all()
+    ).group_by(
+        Budget.id, Budget.name, Budget.category_id, Budget.amount, Budget.alert_threshold
+    ).order_by(Budget.id).all()
 
-    total_budgeted = sum(b.amount for b in budgets)
-    total_spent = 0.0
+    total_budgeted = rows[0].total_budgeted if rows else 0
+    total_spent = rows[0].total_spent if rows else 0.0
     budget_details = []
 
-    for budget in budgets:
-        budget_info = calculate_budget_spent(budget, db)
-        total_spent += budget_info["spent"]
+    for row in rows:
+        budget_info = budget_spent_info(row, row.spent)
 
         budget_details.append({
-            "budget_id": budget.id,
-            "name": budget.name,
-            "category_id": budget.category_id,
-            "budgeted": budget.amount,
+            "budget_id": row.id,
+            "name": row.name,
+            "category_id": row.category_id,
+            "budgeted": row.amount,
             "spent": budget_info["spent"],
             "remaining": budget_info["remaining"],
             "percentage_used": budget_info["percentage_used"],
-            "alert_threshold": budget.alert_threshold,
-            "is_over_budget": budget_info["spent"] > budget.amount,
-            "is_near_limit": budget_info["percentage_used"] >= budget.alert_threshold
+            "alert_threshold": row.alert_threshold,
+            "is_over_budget": budget_info["spent"] > row.amount,
+            "is_near_limit": budget_info["percentage_used"] >= row.alert_threshold
         })
 
     return {
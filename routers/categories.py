@@ -1,14 +1,39 @@
 from fastapi import APIRouter, Depends, HTTPException, status,Request
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
+from sqlalchemy import exists
 from typing import List, Optional
 
-from database import get_db
-from models import Category, User
+from database import get_db, strict_loading
+from models import Category, User, Transaction
 from schemas import CategoryCreate, CategoryUpdate, CategoryResponse
 from security import get_current_user
 from common.enum import TransactionTypeEnum
+from common.cache import make_cache, clear_dashboard_cache
+from config import settings
 router = APIRouter()
 
+# Per-user category lists, cleared whenever the user changes a category
+category_cache = make_cache(settings.CATEGORY_CACHE_TTL)
+
+
+def category_cache_scope(user_id: int) -> str:
+    return f"cats:{user_id}:"
+
+
+def clear_category_cache(user_id: int) -> None:
+    category_cache.clear(category_cache_scope(user_id))
+
+
+def category_name_map(db: Session, category_ids) -> dict:
+    """Map category ids to names with one IN query"""
+    category_ids = {category_id for category_id in category_ids if category_id}
+    if not category_ids:
+        return {}
+    return dict(
+        db.query(Category.id, Category.name).filter(Category.id.in_(category_ids)).all()
+    )
+
 
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
 async def create_category(
@@ -20,7 +45,7 @@ async def create_category(
     existing = db.query(Category).filter(
         Category.name == category_data.name,
         Category.user_id == current_user.id,
-        Category.transaction_type == category_data.transaction_type.value
+        Category.transaction_type == category_data.transaction_type
     ).first()
 
     if existing:
@@ -34,13 +59,14 @@ async def create_category(
         description=category_data.description,
         icon=category_data.icon,
         color=category_data.color,
-        transaction_type=category_data.transaction_type.value,
+        transaction_type=category_data.transaction_type,
         user_id=current_user.id
     )
 
     db.add(category)
     db.commit()
     db.refresh(category)
+    clear_category_cache(current_user.id)
     return category
 
 
@@ -52,12 +78,24 @@ async def list_categories(
         current_user: User = Depends(get_current_user)
 ):
     """List all categories for the current user"""
-    query = db.query(Category).filter(Category.user_id == current_user.id)
+    cache_scope = category_cache_scope(current_user.id)
+    cache_key = transaction_type.value if transaction_type else "all"
+    cached = category_cache.get(cache_key, cache_scope)
+    if cached is not None:
+        return cached
+
+    # CategoryResponse only reads columns; with STRICT_LOADING a stray lazy load raises
+    query = db.query(Category).options(*strict_loading()).filter(Category.user_id == current_user.id)
 
     if transaction_type:
         query = query.filter(Category.transaction_type == transaction_type)
 
-    categories = query.order_by(Category.name).all()
+    # Stored as plain JSON so the Redis backend can hold it too
+    categories = jsonable_encoder([
+        CategoryResponse.model_validate(category)
+        for category in query.order_by(Category.name).all()
+    ])
+    category_cache.set(cache_key, categories, cache_scope)
     return categories
 
 
@@ -68,12 +106,9 @@ async def get_category(
         current_user: User = Depends(get_current_user)
 ):
     """Get a specific category"""
-    category = db.query(Category).filter(
-        Category.id == category_id,
-        Category.user_id == current_user.id
-    ).first()
+    category = db.get(Category, category_id)
 
-    if not category:
+    if category is None or category.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
@@ -90,12 +125,9 @@ async def update_category(
         current_user: User = Depends(get_current_user)
 ):
     """Update a category"""
-    category = db.query(Category).filter(
-        Category.id == category_id,
-        Category.user_id == current_user.id
-    ).first()
+    category = db.get(Category, category_id)
 
-    if not category:
+    if category is None or category.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
@@ -128,6 +160,8 @@ async def update_category(
 
     db.commit()
     db.refresh(category)
+    clear_category_cache(current_user.id)
+    clear_dashboard_cache(current_user.id)
     return category
 
 
@@ -138,19 +172,19 @@ async def delete_category(
         current_user: User = Depends(get_current_user)
 ):
     """Delete a category"""
-    category = db.query(Category).filter(
-        Category.id == category_id,
-        Category.user_id == current_user.id
-    ).first()
+    category = db.get(Category, category_id)
 
-    if not category:
+    if category is None or category.user_id != current_user.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Category not found"
         )
 
     # Check if category has transactions
-    if category.transactions:
+    has_transactions = db.query(
+        exists().where(Transaction.category_id == category_id)
+    ).scalar()
+    if has_transactions:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete category with existing transactions"
@@ -158,4 +192,6 @@ async def delete_category(
 
     db.delete(category)
     db.commit()
+    clear_category_cache(current_user.id)
+    clear_dashboard_cache(current_user.id)
     return None
\ No newline at end of file
@@ -1,11 +1,12 @@
 
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract, and_
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, case, func, extract
 from datetime import datetime, timedelta
 from collections import defaultdict
+import heapq
 
-from database import get_db
+from database import get_db, strict_loading
 from models import Transaction, User, Category, Budget
 from schemas import (
     DashboardResponse, DashboardSummary, CategorySpending,
@@ -15,48 +16,81 @@ from schemas import (
 from common.enum import TransactionTypeEnum
 
 from security import get_current_user
+from common.cache import dashboard_cache, cached_per_user
+from common.dates import month_bounds
+from routers.categories import category_name_map
 
 router = APIRouter()
 
 
+def monthly_totals(db: Session, user_id: int) -> dict:
+    """Sum income and expense per "YYYY-MM" month in SQL"""
+    # One row per (year, month, type)
+    txn_year = extract('year', Transaction.transaction_date)
+    txn_month = extract('month', Transaction.transaction_date)
+    monthly_rows = db.query(
+        txn_year,
+        txn_month,
+        Transaction.transaction_type,
+        func.sum(Transaction.amount)
+    ).filter(
+        Transaction.user_id == user_id
+    ).group_by(txn_year, txn_month, Transaction.transaction_type).all()
+
+    monthly_data = defaultdict(lambda: {"income": 0.0, "expense": 0.0})
+    for year, month, transaction_type, amount in monthly_rows:
+        month_key = f"{int(year):04d}-{int(month):02d}"
+        if transaction_type == TransactionTypeEnum.INCOME:
+            monthly_data[month_key]["income"] += amount
+        else:
+            monthly_data[month_key]["expense"] += amount
+    return monthly_data
+
+
 @router.get("/", response_model=DashboardResponse)
+@cached_per_user(dashboard_cache, "dashboard")
 async def get_dashboard(
         months: int = Query(6, ge=1, le=12),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Get comprehensive dashboard data"""
-    # Get all transactions
-    transactions = db.query(Transaction).filter(
+    # Income/expense totals and transaction count, aggregated in SQL
+    type_totals = db.query(
+        Transaction.transaction_type,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id)
+    ).filter(
         Transaction.user_id == current_user.id
-    ).order_by(Transaction.transaction_date.desc()).all()
-
-    # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.transaction_type == TransactionTypeEnum.INCOME)
-    total_expense = sum(t.amount for t in transactions if t.transaction_type == TransactionTypeEnum.EXPENSE)
+    ).group_by(Transaction.transaction_type).all()
+
+    total_income = 0.0
+    total_expense = 0.0
+    transaction_count = 0
+    for transaction_type, amount, count in type_totals:
+        if transaction_type == TransactionTypeEnum.INCOME:
+            total_income = amount
+        elif transaction_type == TransactionTypeEnum.EXPENSE:
+            total_expense = amount
+        transaction_count += count
     savings = total_income - total_expense
 
+    monthly_data = monthly_totals(db, current_user.id)
+
     # Get current month budgets
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    now = datetime.now()
+    current_month = now.month
+    current_year = now.year
 
-    budgets = db.query(Budget).filter(
+    total_budgeted = db.query(func.coalesce(func.sum(Budget.amount), 0)).filter(
         Budget.user_id == current_user.id,
         Budget.month == current_month,
         Budget.year == current_year
-    ).all()
+    ).scalar()
 
-    total_budgeted = sum(b.amount for b in budgets)
-
-    # Calculate monthly expenses for current month
-    monthly_expenses = db.query(func.sum(Transaction.amount)).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.transaction_type == TransactionTypeEnum.EXPENSE,
-            extract('month', Transaction.transaction_date) == current_month,
-            extract('year', Transaction.transaction_date) == current_year
-        )
-    ).scalar() or 0.0
+    # Monthly expenses for current month come from the monthly totals
+    current_key = f"{current_year:04d}-{current_month:02d}"
+    monthly_expenses = monthly_data[current_key]["expense"] if current_key in monthly_data else 0.0
 
     budget_utilization = (monthly_expenses / total_budgeted * 100) if total_budgeted > 0 else 0
 
@@ -65,48 +99,36 @@ async def get_dashboard(
         total_income=total_income,
         total_expense=total_expense,
         savings=savings,
-        transaction_count=len(transactions),
+        transaction_count=transaction_count,
         budget_utilization=round(budget_utilization, 2)
     )
 
-    # Category spending (top 5)
-    category_totals = defaultdict(float)
-    for t in transactions:
-        if t.category_id and t.transaction_type == TransactionTypeEnum.EXPENSE:
-            category_totals[t.category_id] += t.amount
+    # Category spending (top 5), summed and joined to Category in SQL
+    category_totals = db.query(
+        Category.name,
+        func.sum(Transaction.amount).label("amount")
+    ).join(
+        Category, Transaction.category_id == Category.id
+    ).filter(
+        Transaction.user_id == current_user.id,
+        Transaction.transaction_type == TransactionTypeEnum.EXPENSE
+    ).group_by(Category.id, Category.name).order_by(
+        func.sum(Transaction.amount).desc()
+    ).limit(5).all()
 
     category_spending = []
-    for cat_id, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True)[:5]:
-        category = db.query(Category).filter(Category.id == cat_id).first()
-        if category:
-            percentage = (amount / total_expense * 100) if total_expense > 0 else 0
-            category_spending.append(
-                CategorySpending(
-                    category_name=category.name,
-                    amount=amount,
-                    percentage=round(percentage, 2)
-                )
+    for category_name, amount in category_totals:
+        percentage = (amount / total_expense * 100) if total_expense > 0 else 0
+        category_spending.append(
+            CategorySpending(
+                category_name=category_name,
+                amount=amount,
+                percentage=round(percentage, 2)
             )
-
-    # Monthly trend
-    monthly_data = defaultdict(lambda: {"income": 0.0, "expense": 0.0})
-
-    for t in transactions:
-        month_key = t.transaction_date.strftime("%Y-%m")
-        print(
-            month_key,
-            t.amount,
-            t.transaction_type,
-            t.transaction_type == TransactionTypeEnum.INCOME,
-            t.transaction_type == TransactionTypeEnum.EXPENSE
         )
 
-        if t.transaction_type.value == TransactionTypeEnum.INCOME.value:
-            monthly_data[month_key]["income"] += t.amount
-        elif t.transaction_type.value == TransactionTypeEnum.EXPENSE.value:
-            monthly_data[month_key]["expense"] += t.amount
-
-    sorted_months = sorted(monthly_data.keys(), reverse=True)[:months]
+    # Monthly trend
+    sorted_months = heapq.nlargest(months, monthly_data)
     monthly_trend = []
     for month in sorted_months[::-1]:  # Oldest first
         data = monthly_data[month]
@@ -121,7 +143,12 @@ async def get_dashboard(
 
 
     # Recent transactions (last 10)
-    recent_transactions = transactions[:10]
+    recent_transactions = db.query(Transaction).options(
+        selectinload(Transaction.category),
+        *strict_loading()
+    ).filter(
+        Transaction.user_id == current_user.id
+    ).order_by(Transaction.transaction_date.desc()).limit(10).all()
 
     return DashboardResponse(
         summary=summary,
@@ -132,42 +159,45 @@ async def get_dashboard(
 
 
 @router.get("/summary")
+@cached_per_user(dashboard_cache, "dashboard")
 async def get_summary(
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Get quick summary statistics"""
-    # All time totals
-    all_transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).all()
-
-    total_income = sum(t.amount for t in all_transactions if t.transaction_type == TransactionTypeEnum.INCOME)
-    total_expense = sum(t.amount for t in all_transactions if t.transaction_type == TransactionTypeEnum.EXPENSE)
-
-    # Current month
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-
-    month_transactions = [
-        t for t in all_transactions
-        if t.transaction_date.month == current_month and t.transaction_date.year == current_year
-    ]
-
-    month_income = sum(t.amount for t in month_transactions if t.transaction_type == TransactionTypeEnum.INCOME)
-    month_expense = sum(t.amount for t in month_transactions if t.transaction_type == TransactionTypeEnum.EXPENSE)
-
-    # Last month
+    now = datetime.now()
+    current_month = now.month
+    current_year = now.year
     last_month = current_month - 1 if current_month > 1 else 12
     last_year = current_year if current_month > 1 else current_year - 1
 
-    last_month_transactions = [
-        t for t in all_transactions
-        if t.transaction_date.month == last_month and t.transaction_date.year == last_year
-    ]
-
-    last_month_expense = sum(
-        t.amount for t in last_month_transactions if t.transaction_type == TransactionTypeEnum.EXPENSE)
+    month_start, month_end = month_bounds(current_year, current_month)
+    last_month_start, _ = month_bounds(last_year, last_month)
+
+    is_income = Transaction.transaction_type == TransactionTypeEnum.INCOME
+    is_expense = Transaction.transaction_type == TransactionTypeEnum.EXPENSE
+    in_month = and_(Transaction.transaction_date >= month_start, Transaction.transaction_date < month_end)
+    in_last_month = and_(Transaction.transaction_date >= last_month_start, Transaction.transaction_date < month_start)
+
+    def total(condition):
+        return func.coalesce(func.sum(case((condition, Transaction.amount), else_=0)), 0)
+
+    # All-time, current month and last month figures in one pass over the user's rows
+    (
+        total_income, total_expense, transaction_count,
+        month_income, month_expense, month_count,
+        last_month_expense
+    ) = db.query(
+        total(is_income),
+        total(is_expense),
+        func.count(Transaction.id),
+        total(and_(in_month, is_income)),
+        total(and_(in_month, is_expense)),
+        func.count(case((in_month, Transaction.id))),
+        total(and_(in_last_month, is_expense))
+    ).filter(
+        Transaction.user_id == current_user.id
+    ).one()
 
     # Calculate trends
     expense_trend = ((month_expense - last_month_expense) / last_month_expense * 100) if last_month_expense > 0 else 0
@@ -177,13 +207,13 @@ async def get_summary(
             "total_income": total_income,
             "total_expense": total_expense,
             "net_savings": total_income - total_expense,
-            "transaction_count": len(all_transactions)
+            "transaction_count": transaction_count
         },
         "current_month": {
             "income": month_income,
             "expense": month_expense,
             "savings": month_income - month_expense,
-            "transaction_count": len(month_transactions)
+            "transaction_count": month_count
         },
         "trends": {
             "expense_change_percentage": round(expense_trend, 2),
@@ -193,6 +223,7 @@ async def get_summary(
 
 
 @router.get("/charts/category-distribution")
+@cached_per_user(dashboard_cache, "dashboard")
 async def category_distribution(
         months: int = Query(1, ge=1, le=12),
         db: Session = Depends(get_db),
@@ -203,7 +234,7 @@ async def category_distribution(
     end_date = datetime.now()
     start_date = end_date - timedelta(days=30 * months)
 
-    transactions = db.query(Transaction).filter(
+    transactions = db.query(Transaction.amount, Transaction.category_id).filter(
         Transaction.user_id == current_user.id,
         Transaction.transaction_type == TransactionTypeEnum.EXPENSE,
         Transaction.transaction_date >= start_date
@@ -211,12 +242,14 @@ async def category_distribution(
 
     total = sum(t.amount for t in transactions)
 
+    category_names = category_name_map(db, (t.category_id for t in transactions))
+
     category_data = defaultdict(float)
     for t in transactions:
         if t.category_id:
-            category = db.query(Category).filter(Category.id == t.category_id).first()
-            if category:
-                category_data[category.name] += t.amount
+            category_name = category_names.get(t.category_id)
+            if category_name:
+                category_data[category_name] += t.amount
         else:
             category_data["Uncategorized"] += t.amount
 
@@ -236,26 +269,15 @@ async def category_distribution(
 
 
 @router.get("/charts/monthly-trend")
+@cached_per_user(dashboard_cache, "dashboard")
 async def monthly_trend(
         months: int = Query(6, ge=1, le=12),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Get data for monthly income/expense trend chart"""
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).all()
-
-    monthly_data = defaultdict(lambda: {"income": 0.0, "expense": 0.0})
-
-    for t in transactions:
-        month_key = t.transaction_date.strftime("%Y-%m")
-        if t.transaction_type == TransactionTypeEnum.INCOME:
-            monthly_data[month_key]["income"] += t.amount
-        else:
-            monthly_data[month_key]["expense"] += t.amount
-
-    sorted_months = sorted(monthly_data.keys(), reverse=True)[:months]
+    monthly_data = monthly_totals(db, current_user.id)
+    sorted_months = heapq.nlargest(months, monthly_data)
 
     result = [
         {
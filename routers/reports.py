@@ -1,20 +1,51 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, extract
+from sqlalchemy import and_, func
 from typing import Optional
 from datetime import datetime
 import csv
-import io
+import heapq
 from collections import defaultdict
 
-from database import get_db
+from database import get_db, SessionLocal
 from models import Transaction, User, Category
 from schemas import ReportFilter, ReportSummary, CategorySpending
 from security import get_current_user
 from common.enum import TransactionTypeEnum
+from common.cache import dashboard_cache, cached_per_user
+from common.dates import month_bounds
+from routers.dashboard import monthly_totals
+from routers.categories import category_name_map
 router = APIRouter()
 
+# Rows fetched from the cursor and flushed to the client per chunk
+CSV_BATCH_SIZE = 1000
+
+# Bound once for the per-transaction loops below
+_INCOME = TransactionTypeEnum.INCOME
+_EXPENSE = TransactionTypeEnum.EXPENSE
+
+# Columns the aggregate reports read; loaded as rows, not Transaction objects
+REPORT_COLUMNS = (Transaction.amount, Transaction.transaction_type, Transaction.category_id)
+
+
+class RowBuffer:
+    """File-like sink for csv.writer that hands back each batch of rows once"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data: str) -> int:
+        self.chunks.append(data)
+        return len(data)
+
+    def drain(self) -> str:
+        """Return everything written since the last drain and reset"""
+        batch = "".join(self.chunks)
+        self.chunks.clear()
+        return batch
+
 
 @router.post("/summary", response_model=ReportSummary)
 async def generate_report_summary(
@@ -23,7 +54,7 @@ async def generate_report_summary(
         current_user: User = Depends(get_current_user)
 ):
     """Generate financial report summary with filters"""
-    query = db.query(Transaction).filter(Transaction.user_id == current_user.id)
+    query = db.query(*REPORT_COLUMNS).filter(Transaction.user_id == current_user.id)
 
     # Apply filters
     if filters.start_date:
@@ -38,24 +69,26 @@ async def generate_report_summary(
     transactions = query.all()
 
     # Calculate totals
-    total_income = sum(t.amount for t in transactions if t.transaction_type == TransactionTypeEnum.INCOME)
-    total_expense = sum(t.amount for t in transactions if t.transaction_type == TransactionTypeEnum.EXPENSE)
+    total_income = sum(t.amount for t in transactions if t.transaction_type == _INCOME)
+    total_expense = sum(t.amount for t in transactions if t.transaction_type == _EXPENSE)
     net_savings = total_income - total_expense
 
     # Category breakdown
     category_totals = defaultdict(float)
     for t in transactions:
-        if t.category_id and t.transaction_type == TransactionTypeEnum.EXPENSE:
+        if t.category_id and t.transaction_type == _EXPENSE:
             category_totals[t.category_id] += t.amount
 
+    category_names = category_name_map(db, category_totals.keys())
+
     category_breakdown = []
     for cat_id, amount in category_totals.items():
-        category = db.query(Category).filter(Category.id == cat_id).first()
-        if category:
+        category_name = category_names.get(cat_id)
+        if category_name:
             percentage = (amount / total_expense * 100) if total_expense > 0 else 0
             category_breakdown.append(
                 CategorySpending(
-                    category_name=category.name,
+                    category_name=category_name,
                     amount=amount,
                     percentage=round(percentage, 2)
                 )
@@ -73,6 +106,7 @@ async def generate_report_summary(
 
 
 @router.get("/monthly")
+@cached_per_user(dashboard_cache, "dashboard")
 async def monthly_report(
         month: int = Query(..., ge=1, le=12),
         year: int = Query(..., ge=2000, le=2100),
@@ -80,26 +114,30 @@ async def monthly_report(
         current_user: User = Depends(get_current_user)
 ):
     """Generate monthly financial report"""
-    # Query transactions for the month
-    transactions = db.query(Transaction).filter(
+    # Query transactions for the month; a plain date range lets the
+    # (user_id, ..., transaction_date) indexes serve the filter
+    start_date, end_date = month_bounds(year, month)
+    transactions = db.query(*REPORT_COLUMNS).filter(
         Transaction.user_id == current_user.id,
-        extract('month', Transaction.transaction_date) == month,
-        extract('year', Transaction.transaction_date) == year
+        Transaction.transaction_date >= start_date,
+        Transaction.transaction_date < end_date
     ).all()
 
-    total_income = sum(t.amount for t in transactions if t.transaction_type == TransactionTypeEnum.INCOME)
-    total_expense = sum(t.amount for t in transactions if t.transaction_type == TransactionTypeEnum.EXPENSE)
+    total_income = sum(t.amount for t in transactions if t.transaction_type == _INCOME)
+    total_expense = sum(t.amount for t in transactions if t.transaction_type == _EXPENSE)
+
+    category_names = category_name_map(db, (t.category_id for t in transactions))
 
     # Category breakdown
     category_totals = defaultdict(lambda: {"income": 0.0, "expense": 0.0})
     for t in transactions:
         if t.category_id:
-            category = db.query(Category).filter(Category.id == t.category_id).first()
-            if category:
-                if t.transaction_type == TransactionTypeEnum.INCOME:
-                    category_totals[category.name]["income"] += t.amount
+            category_name = category_names.get(t.category_id)
+            if category_name:
+                if t.transaction_type == _INCOME:
+                    category_totals[category_name]["income"] += t.amount
                 else:
-                    category_totals[category.name]["expense"] += t.amount
+                    category_totals[category_name]["expense"] += t.amount
 
     return {
         "month": month,
@@ -121,7 +159,15 @@ async def category_wise_report(
         current_user: User = Depends(get_current_user)
 ):
     """Generate category-wise spending report"""
-    query = db.query(Transaction).filter(
+    # Totals and counts per category in SQL; the outer join keeps
+    # uncategorized spending in the overall total
+    query = db.query(
+        Category.name,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id)
+    ).outerjoin(
+        Category, Transaction.category_id == Category.id
+    ).filter(
         Transaction.user_id == current_user.id,
         Transaction.transaction_type == TransactionTypeEnum.EXPENSE
     )
@@ -131,40 +177,25 @@ async def category_wise_report(
     if end_date:
         query = query.filter(Transaction.transaction_date <= end_date)
 
-    transactions = query.all()
-    total_expense = sum(t.amount for t in transactions)
-
-    # Group by category
-    category_data = defaultdict(lambda: {"total": 0.0, "count": 0, "transactions": []})
-
-    for t in transactions:
-        if t.category_id:
-            category = db.query(Category).filter(Category.id == t.category_id).first()
-            if category:
-                cat_name = category.name
-                category_data[cat_name]["total"] += t.amount
-                category_data[cat_name]["count"] += 1
-                category_data[cat_name]["transactions"].append({
-                    "id": t.id,
-                    "amount": t.amount,
-                    "description": t.description,
-                    "date": t.transaction_date.isoformat()
-                })
+    category_rows = query.group_by(Category.id, Category.name).order_by(
+        func.sum(Transaction.amount).desc()
+    ).all()
+    total_expense = sum(amount for _, amount, _ in category_rows)
 
     # Calculate percentages
     result = []
-    for cat_name, data in category_data.items():
-        percentage = (data["total"] / total_expense * 100) if total_expense > 0 else 0
+    for cat_name, total, count in category_rows:
+        if cat_name is None:
+            continue
+        percentage = (total / total_expense * 100) if total_expense > 0 else 0
         result.append({
             "category": cat_name,
-            "total_spent": data["total"],
-            "transaction_count": data["count"],
+            "total_spent": total,
+            "transaction_count": count,
             "percentage": round(percentage, 2),
-            "average_transaction": data["total"] / data["count"] if data["count"] > 0 else 0
+            "average_transaction": total / count if count > 0 else 0
         })
 
-    result.sort(key=lambda x: x["total_spent"], reverse=True)
-
     return {
         "total_expense": total_expense,
         "categories": result
@@ -172,28 +203,18 @@ async def category_wise_report(
 
 
 @router.get("/income-vs-expense")
+@cached_per_user(dashboard_cache, "dashboard")
 async def income_vs_expense_report(
         months: int = Query(6, ge=1, le=24),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Generate income vs expense comparison report"""
-    transactions = db.query(Transaction).filter(
-        Transaction.user_id == current_user.id
-    ).order_by(Transaction.transaction_date.desc()).all()
-
-    # Group by month
-    monthly_data = defaultdict(lambda: {"income": 0.0, "expense": 0.0})
-
-    for t in transactions:
-        month_key = t.transaction_date.strftime("%Y-%m")
-        if t.transaction_type == TransactionTypeEnum.INCOME:
-            monthly_data[month_key]["income"] += t.amount
-        else:
-            monthly_data[month_key]["expense"] += t.amount
+    # Group by month in SQL
+    monthly_data = monthly_totals(db, current_user.id)
 
     # Sort and limit to requested months
-    sorted_months = sorted(monthly_data.keys(), reverse=True)[:months]
+    sorted_months = heapq.nlargest(months, monthly_data)
 
     result = []
     for month in sorted_months:
@@ -223,47 +244,60 @@ async def export_csv(
         current_user: User = Depends(get_current_user)
 ):
     """Export transactions to CSV"""
-    query = db.query(Transaction).filter(Transaction.user_id == current_user.id)
+    query = db.query(
+        Transaction.id,
+        Transaction.transaction_date,
+        Transaction.transaction_type,
+        Transaction.amount,
+        Transaction.description,
+        Transaction.notes
+    ).filter(Transaction.user_id == current_user.id)
 
     if start_date:
         query = query.filter(Transaction.transaction_date >= start_date)
     if end_date:
         query = query.filter(Transaction.transaction_date <= end_date)
 
-    transactions = query.order_by(Transaction.transaction_date.desc()).all()
-
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write header
-    writer.writerow([
-        "ID", "Date", "Type", "Category", "Amount",
-        "Description", "Notes"
-    ])
-
-    # Write data
-    for t in transactions:
-        category_name = ""
-        if t.category_id:
-            category = db.query(Category).filter(Category.id == t.category_id).first()
-            if category:
-                category_name = category.name
-
-        writer.writerow([
-            t.id,
-            t.transaction_date.strftime("%Y-%m-%d"),
-            t.transaction_type.value,
-            category_name,
-            t.amount,
-            t.description or "",
-            t.notes or ""
-        ])
-
-    output.seek(0)
+    # Join the category name in the same statement
+    query = query.add_columns(Category.name.label("category_name")).outerjoin(
+        Category, Transaction.category_id == Category.id
+    ).order_by(Transaction.transaction_date.desc())
+
+    def generate_csv():
+        # The request session is closed once the handler returns, so the
+        # stream reads through its own session
+        stream_db = SessionLocal()
+        try:
+            output = RowBuffer()
+            writer = csv.writer(output)
+
+            # Write header
+            writer.writerow([
+                "ID", "Date", "Type", "Category", "Amount",
+                "Description", "Notes"
+            ])
+
+            # Write data, fetching and flushing one batch at a time
+            rows = query.with_session(stream_db).yield_per(CSV_BATCH_SIZE)
+            for count, t in enumerate(rows, start=1):
+                writer.writerow([
+                    t.id,
+                    t.transaction_date.strftime("%Y-%m-%d"),
+                    t.transaction_type.value,
+                    t.category_name or "",
+                    t.amount,
+                    t.description or "",
+                    t.notes or ""
+                ])
+                if count % CSV_BATCH_SIZE == 0:
+                    yield output.drain()
+
+            yield output.drain()
+        finally:
+            stream_db.close()
 
     return StreamingResponse(
-        iter([output.getvalue()]),
+        generate_csv(),
         media_type="text/csv",
         headers={
             "Content-Disposition": f"attachment; filename=transactions_{datetime.now().strftime('%Y%m%d')}.csv"
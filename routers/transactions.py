@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import func, case
 from typing import Optional, List
 from datetime import datetime
 
-from database import get_db
+from database import get_db, strict_loading
 from models import Transaction, User, Category, CustomTransactionType
 from schemas import (
     TransactionCreate, TransactionUpdate, TransactionResponse,
@@ -14,6 +14,8 @@ from schemas import (
 )
 from security import get_current_user
 from common.enum import TransactionTypeEnum
+from common.cache import clear_dashboard_cache
+from common.dates import utc_now
 router = APIRouter()
 
 
@@ -56,13 +58,14 @@ async def create_transaction(
         transaction_type=transaction_data.transaction_type,
         category_id=transaction_data.category_id,
         custom_type_id=transaction_data.custom_type_id,
-        transaction_date=transaction_data.transaction_date or datetime.utcnow(),
+        transaction_date=transaction_data.transaction_date or utc_now(),
         notes=transaction_data.notes
     )
 
     db.add(transaction)
     db.commit()
     db.refresh(transaction)
+    clear_dashboard_cache(current_user.id)
     return transaction
 
 
@@ -78,48 +81,50 @@ async def list_transactions(
         current_user: User = Depends(get_current_user)
 ):
     """List transactions with filters"""
-    query = db.query(Transaction).filter(Transaction.user_id == current_user.id)
+    filters = [Transaction.user_id == current_user.id]
 
     # Apply filters
     if transaction_type:
-        query = query.filter(Transaction.transaction_type == transaction_type)
+        filters.append(Transaction.transaction_type == transaction_type)
     if category_id:
-        query = query.filter(Transaction.category_id == category_id)
+        filters.append(Transaction.category_id == category_id)
     if start_date:
-        query = query.filter(Transaction.transaction_date >= start_date)
+        filters.append(Transaction.transaction_date >= start_date)
     if end_date:
-        query = query.filter(Transaction.transaction_date <= end_date)
-
-    # Get totals
-    total_count = query.count()
-
-    income_sum = db.query(func.sum(Transaction.amount)).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.transaction_type == TransactionTypeEnum.INCOME
-        )
-    ).scalar() or 0.0
-
-    expense_sum = db.query(func.sum(Transaction.amount)).filter(
-        and_(
-            Transaction.user_id == current_user.id,
-            Transaction.transaction_type == TransactionTypeEnum.EXPENSE
-        )
-    ).scalar() or 0.0
-
-    # Apply pagination
-    transactions = query.order_by(
+        filters.append(Transaction.transaction_date <= end_date)
+
+    # Get count and totals for the filtered set in one scan
+    total_count, income_sum, expense_sum = db.query(
+        func.count(Transaction.id),
+        func.coalesce(func.sum(case(
+            (Transaction.transaction_type == TransactionTypeEnum.INCOME, Transaction.amount),
+            else_=0.0
+        )), 0.0),
+        func.coalesce(func.sum(case(
+            (Transaction.transaction_type == TransactionTypeEnum.EXPENSE, Transaction.amount),
+            else_=0.0
+        )), 0.0)
+    ).filter(*filters).one()
+
+    # Apply pagination; TransactionResponse reads only the category relationship
+    transactions = db.query(Transaction).options(
+        selectinload(Transaction.category),
+        *strict_loading()
+    ).filter(*filters).order_by(
         Transaction.transaction_date.desc()
     ).offset((page - 1) * page_size).limit(page_size).all()
 
-    return {
+    # Validate once and serialize straight to JSON; returning a Response
+    # skips FastAPI's second validation pass over every row
+    response = TransactionListResponse.model_validate({
         "transactions": transactions,
         "total_count": total_count,
         "total_income": income_sum,
         "total_expense": expense_sum,
         "page": page,
         "page_size": page_size
-    }
+    })
+    return Response(content=response.model_dump_json(), media_type="application/json")
 
 
 @router.get("/{transaction_id}", response_model=TransactionResponse)
@@ -129,7 +134,8 @@ async def get_transaction(
         current_user: User = Depends(get_current_user)
 ):
     """Get a specific transaction"""
-    transaction = db.query(Transaction).filter(
+    # Many-to-one, so joining the category adds no duplicate rows
+    transaction = db.query(Transaction).options(joinedload(Transaction.category)).filter(
         Transaction.id == transaction_id,
         Transaction.user_id == current_user.id
     ).first()
@@ -180,6 +186,7 @@ async def update_transaction(
 
     db.commit()
     db.refresh(transaction)
+    clear_dashboard_cache(current_user.id)
     return transaction
 
 
@@ -203,6 +210,7 @@ async def delete_transaction(
 
     db.delete(transaction)
     db.commit()
+    clear_dashboard_cache(current_user.id)
     return None
 
 
@@ -1,8 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
+from sqlalchemy import exists, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Optional
 import os
+import secrets
 import shutil
-from pathlib import Path
 
 from database import get_db
 from models import User, UserSettings
@@ -15,6 +20,65 @@ from config import settings
 
 router = APIRouter()
 
+# Bytes copied per read/write when saving uploads
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Accepted profile picture MIME types and the leading bytes each must start with
+IMAGE_SIGNATURES = {
+    "image/jpeg": b"\xff\xd8\xff",
+    "image/png": b"\x89PNG",
+}
+ALLOWED_IMAGE_TYPES = frozenset(IMAGE_SIGNATURES)
+
+# Where profile pictures are saved; created once at startup (see main.lifespan).
+# normpath keeps stored paths in their original "uploads/profile_pictures/..." form
+PROFILE_PICTURE_DIR = os.path.normpath(os.path.join(settings.UPLOAD_DIR, "profile_pictures"))
+
+
+def is_same_upload(source, file_path: str) -> bool:
+    """Whether the saved file already holds exactly the uploaded bytes"""
+    try:
+        saved_size = os.path.getsize(file_path)
+    except OSError:
+        return False
+
+    # Sizes differ for nearly every real change, so compare bytes only on a size match
+    source.seek(0, os.SEEK_END)
+    upload_size = source.tell()
+    source.seek(0)
+    if upload_size != saved_size:
+        return False
+
+    # Compare chunk by chunk, stopping at the first difference; this reads the
+    # saved file once instead of hashing both sides
+    try:
+        with open(file_path, "rb") as saved:
+            while True:
+                chunk = source.read(UPLOAD_CHUNK_SIZE)
+                if chunk != saved.read(UPLOAD_CHUNK_SIZE):
+                    return False
+                if not chunk:
+                    return True
+    finally:
+        source.seek(0)
+
+
+def save_upload(source, file_path: str) -> None:
+    """Copy an uploaded file to disk (blocking; run in a worker thread).
+
+    The data goes to a private temp file that is renamed into place, so
+    concurrent uploads never interleave and readers never see a partial file.
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{secrets.token_hex(4)}.part"
+    try:
+        with open(tmp_path, "wb", buffering=UPLOAD_CHUNK_SIZE) as buffer:
+            shutil.copyfileobj(source, buffer, length=UPLOAD_CHUNK_SIZE)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 
 @router.get("/profile", response_model=UserResponse)
 async def get_profile(current_user: User = Depends(get_current_user)):
@@ -23,7 +87,7 @@ async def get_profile(current_user: User = Depends(get_current_user)):
 
 
 @router.put("/profile", response_model=UserResponse)
-async def update_profile(
+def update_profile(
         user_update: UserUpdate,
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
@@ -31,8 +95,9 @@ async def update_profile(
     """Update user profile"""
     # Check if email is being changed and if it's already taken
     if user_update.email and user_update.email != current_user.email:
-        existing_user = db.query(User).filter(User.email == user_update.email).first()
-        if existing_user:
+        # The unique index on email answers this without loading a User
+        email_taken = db.query(exists().where(User.email == user_update.email)).scalar()
+        if email_taken:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
@@ -54,22 +119,23 @@ async def change_password(
         current_user: User = Depends(get_current_user)
 ):
     """Change user password"""
-    # Verify current password
-    if not verify_password(password_data.current_password, current_user.hashed_password):
+    # New password length is validated by PasswordChange; cheap checks run
+    # before the Argon2 verify
+    if password_data.new_password == password_data.current_password:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Current password is incorrect"
+            detail="New password must be different from the current password"
         )
 
-    # Validate new password
-    if len(password_data.new_password) < settings.PASSWORD_MIN_LENGTH:
+    # Verify current password
+    if not await run_in_threadpool(verify_password, password_data.current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Password must be at least {settings.PASSWORD_MIN_LENGTH} characters"
+            detail="Current password is incorrect"
         )
 
     # Update password
-    current_user.hashed_password = hash_password(password_data.new_password)
+    current_user.hashed_password = await run_in_threadpool(hash_password, password_data.new_password)
     db.commit()
 
     return {"message": "Password changed successfully"}
@@ -83,38 +149,90 @@ async def upload_profile_picture(
 ):
     """Upload or update profile picture"""
     # Validate file type
-    allowed_types = ["image/jpeg", "image/png", "image/jpg"]
-    if file.content_type not in allowed_types:
+    if file.content_type not in ALLOWED_IMAGE_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only JPEG and PNG images are allowed"
         )
 
-    # Create upload directory if not exists
-    upload_dir = Path(settings.UPLOAD_DIR) / "profile_pictures"
-    upload_dir.mkdir(parents=True, exist_ok=True)
+    # Reject content that does not match the declared type before copying it
+    signature = IMAGE_SIGNATURES[file.content_type]
+    header = file.file.read(len(signature))
+    file.file.seek(0)
+    if header != signature:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File content does not match its image type"
+        )
 
-    # Generate unique filename
+    # Generate unique filename (PROFILE_PICTURE_DIR is created at startup)
     file_extension = file.filename.split(".")[-1]
-    filename = f"user_{current_user.id}.{file_extension}"
-    file_path = upload_dir / filename
+    file_path = os.path.join(PROFILE_PICTURE_DIR, f"user_{current_user.id}.{file_extension}")
 
-    # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    # Re-uploading the current picture changes nothing; skip the write and the UPDATE.
+    # Paths are compared normalized so rows saved as "./uploads/..." still match
+    same_path = current_user.profile_picture is not None and (
+        os.path.normpath(current_user.profile_picture) == os.path.normpath(file_path)
+    )
+    unchanged = same_path and await run_in_threadpool(is_same_upload, file.file, file_path)
+    if not unchanged:
+        # Save file off the event loop
+        await run_in_threadpool(save_upload, file.file, file_path)
 
-    # Update user profile picture path
-    current_user.profile_picture = str(file_path)
-    db.commit()
+        # Update user profile picture path
+        current_user.profile_picture = file_path
+        db.commit()
 
     return {
         "message": "Profile picture uploaded successfully",
-        "file_path": str(file_path)
+        "file_path": file_path
     }
 
 
+# Dialects with INSERT ... ON CONFLICT; others (e.g. MySQL) use get_or_create_user_settings
+UPSERT_INSERTS = {
+    "postgresql": pg_insert,
+    "sqlite": sqlite_insert,
+}
+
+
+def get_or_create_user_settings(db: Session, user_id: int, values: dict) -> UserSettings:
+    """Load or add a user's settings row through the ORM and apply values to it"""
+    user_settings = db.query(UserSettings).filter(UserSettings.user_id == user_id).first()
+    if user_settings is None:
+        user_settings = UserSettings(user_id=user_id)
+        db.add(user_settings)
+
+    for name, value in values.items():
+        setattr(user_settings, name, value)
+    db.flush()
+    return user_settings
+
+
+def upsert_user_settings(db: Session, user_id: int, values: dict) -> Optional[UserSettings]:
+    """Insert or update a user's settings row in one statement.
+
+    With no values an existing row is left alone and None is returned for it.
+    """
+    insert = UPSERT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is None:
+        return get_or_create_user_settings(db, user_id, values)
+
+    stmt = insert(UserSettings).values(user_id=user_id, **values)
+    if values:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserSettings.user_id],
+            set_={**values, "updated_at": func.now()}
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[UserSettings.user_id])
+
+    stmt = stmt.returning(UserSettings).execution_options(populate_existing=True)
+    return db.scalars(stmt).first()
+
+
 @router.get("/settings", response_model=UserSettingsResponse)
-async def get_settings(
+def get_settings(
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
@@ -124,42 +242,30 @@ async def get_settings(
     ).first()
 
     if not settings:
-        # Create default settings if not exists
-        settings = UserSettings(user_id=current_user.id)
-        db.add(settings)
+        # Create default settings if not exists; a concurrent request may win the insert
+        settings = upsert_user_settings(db, current_user.id, {}) or db.query(UserSettings).filter(
+            UserSettings.user_id == current_user.id
+        ).one()
+        response = UserSettingsResponse.model_validate(settings)
         db.commit()
-        db.refresh(settings)
+        return response
 
     return settings
 
 
 @router.put("/settings", response_model=UserSettingsResponse)
-async def update_settings(
+def update_settings(
         settings_update: UserSettingsUpdate,
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Update user settings"""
-    settings = db.query(UserSettings).filter(
-        UserSettings.user_id == current_user.id
-    ).first()
-
-    if not settings:
-        settings = UserSettings(user_id=current_user.id)
-        db.add(settings)
-
-    # Update settings
-    if settings_update.currency is not None:
-        settings.currency = settings_update.currency
-    if settings_update.date_format is not None:
-        settings.date_format = settings_update.date_format
-    if settings_update.notification_enabled is not None:
-        settings.notification_enabled = settings_update.notification_enabled
-    if settings_update.budget_alerts is not None:
-        settings.budget_alerts = settings_update.budget_alerts
-    if settings_update.theme is not None:
-        settings.theme = settings_update.theme
+    # Create-or-update in one round trip; None fields are left unchanged
+    settings = upsert_user_settings(db, current_user.id, settings_update.model_dump(exclude_none=True))
+    if settings is None:
+        settings = db.query(UserSettings).filter(UserSettings.user_id == current_user.id).one()
 
+    # Serialize before commit expires the loaded attributes
+    response = UserSettingsResponse.model_validate(settings)
     db.commit()
-    db.refresh(settings)
-    return settings
\ No newline at end of file
+    return response
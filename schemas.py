@@ -1,8 +1,9 @@
-from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Annotated, Optional, List
 from datetime import datetime
 
 from common.enum import TransactionTypeEnum
+from config import settings
 
 
 
@@ -14,11 +15,15 @@ from common.enum import TransactionTypeEnum
 #     EXPENSE = "EXPENSE"
 
 
+# New passwords, for registration and password changes
+Password = Annotated[str, Field(min_length=settings.PASSWORD_MIN_LENGTH)]
+
+
 # Auth Schemas
 class UserRegister(BaseModel):
     username: str = Field(..., min_length=3, max_length=50)
     email: EmailStr
-    password: str = Field(..., min_length=8)
+    password: Password
     full_name: Optional[str] = None
 
 
@@ -41,8 +46,7 @@ class UserResponse(BaseModel):
     is_active: bool
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class Token(BaseModel):
@@ -66,7 +70,7 @@ class UserUpdate(BaseModel):
 
 class PasswordChange(BaseModel):
     current_password: str
-    new_password: str = Field(..., min_length=8)
+    new_password: Password
 
 
 # Category Schemas
@@ -94,8 +98,7 @@ class CategoryResponse(BaseModel):
     transaction_type: str
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Transaction Type Schemas
@@ -115,8 +118,7 @@ class CustomTransactionTypeResponse(BaseModel):
     description: Optional[str]
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Transaction Schemas
@@ -153,8 +155,7 @@ class TransactionResponse(BaseModel):
     updated_at: datetime
     category: Optional[CategoryResponse]
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class TransactionListResponse(BaseModel):
@@ -196,8 +197,7 @@ class BudgetResponse(BaseModel):
     percentage_used: float = 0.0
     created_at: datetime
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Dashboard Schemas
@@ -261,5 +261,4 @@ class UserSettingsResponse(BaseModel):
     budget_alerts: bool
     theme: str
 
-    class Config:
-        from_attributes = True
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
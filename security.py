@@ -1,36 +1,62 @@
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
+from argon2 import PasswordHasher, Type
+from argon2.exceptions import InvalidHashError, VerificationError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
+import hashlib
 import secrets
+import time
 
 from config import settings
+from common.dates import utc_now
+from common.cache import TTLCache
 from database import get_db
 from models import User, RefreshToken
 
 
 # 🔐 Argon2 password hashing
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto"
+# argon2-cffi directly: the app only ever uses Argon2id, so passlib's scheme
+# dispatch is skipped. Hashes made with other parameters still verify.
+password_hasher = PasswordHasher(
+    time_cost=settings.ARGON2_TIME_COST,
+    memory_cost=settings.ARGON2_MEMORY_COST,
+    parallelism=settings.ARGON2_PARALLELISM,
+    type=Type.ID
 )
 
 security = HTTPBearer()
 
+# Decoded JWT payloads by token digest; entries never outlive the token's exp.
+# Always in-process: a Redis round trip would cost more than the decode it saves
+token_cache = TTLCache(ttl=settings.TOKEN_CACHE_TTL, maxsize=settings.CACHE_MAXSIZE)
+
 
 # ---------------- PASSWORD UTILS ---------------- #
 
 def hash_password(password: str) -> str:
     """Hash password using Argon2"""
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password using Argon2"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify password using Argon2 (passwords must always be checked here, never with ==)"""
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a hash was made with parameters other than the current ones"""
+    return password_hasher.check_needs_rehash(hashed_password)
+
+
+def hash_refresh_token(token: str) -> str:
+    """SHA-256 digest of a refresh token; only the digest is stored"""
+    return hashlib.sha256(token.encode()).hexdigest()
 
 def create_access_token(
     data: dict,
@@ -44,9 +70,9 @@ def create_access_token(
         to_encode["sub"] = str(to_encode["sub"])  # 👈 CRITICAL FIX
 
     expire = (
-        datetime.utcnow() + expires_delta
+        utc_now() + expires_delta
         if expires_delta
-        else datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        else utc_now() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
     to_encode.update({
@@ -65,10 +91,10 @@ def create_access_token(
 def create_refresh_token(user_id: int, db: Session) -> str:
     """Create a refresh token and store it in database"""
     token = secrets.token_urlsafe(32)
-    expires_at = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    expires_at = utc_now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
 
     refresh_token = RefreshToken(
-        token=token,
+        token=hash_refresh_token(token),
         user_id=user_id,
         expires_at=expires_at
     )
@@ -78,10 +104,23 @@ def create_refresh_token(user_id: int, db: Session) -> str:
     return token
 
 
+def decode_token(token: str) -> dict:
+    """Decode a JWT, reusing the payload for tokens seen within TOKEN_CACHE_TTL"""
+    key = hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+    payload = token_cache.get(key)
+    if payload is not None and payload["exp"] > time.time():
+        return payload
+
+    payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    if "exp" in payload:
+        token_cache.set(key, payload)
+    return payload
+
+
 def verify_token(token: str, token_type: str = "refresh") -> dict:
     """Verify and decode a JWT token"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_token(token)
         if payload.get("type") != token_type:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -100,7 +139,11 @@ async def get_current_user(
         credentials: HTTPAuthorizationCredentials = Depends(security),
         db: Session = Depends(get_db)
 ) -> User:
-    """Get current authenticated user from JWT token"""
+    """Get current authenticated user from JWT token.
+
+    FastAPI caches dependencies per request, so the user is loaded once
+    per request however many dependants declare it.
+    """
     token = credentials.credentials
     payload = verify_token(token, "access")
 
@@ -111,7 +154,7 @@ async def get_current_user(
             detail="Could not validate credentials"
         )
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.get(User, int(user_id))
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -129,24 +172,27 @@ async def get_current_user(
 
 def verify_refresh_token(token: str, db: Session) -> Optional[User]:
     """Verify refresh token and return user"""
+    # Looked up by SHA-256 digest: query timing reveals nothing about the
+    # token itself, so no constant-time comparison is needed afterwards
     refresh_token = db.query(RefreshToken).filter(
-        RefreshToken.token == token,
+        RefreshToken.token == hash_refresh_token(token),
         RefreshToken.is_revoked == False
     ).first()
 
     if not refresh_token:
         return None
 
-    if refresh_token.expires_at < datetime.utcnow():
+    if refresh_token.expires_at < utc_now():
         return None
 
-    user = db.query(User).filter(User.id == refresh_token.user_id).first()
-    return user
+    return db.get(User, refresh_token.user_id)
 
 
 def revoke_refresh_token(token: str, db: Session) -> bool:
     """Revoke a refresh token"""
-    refresh_token = db.query(RefreshToken).filter(RefreshToken.token == token).first()
+    refresh_token = db.query(RefreshToken).filter(
+        RefreshToken.token == hash_refresh_token(token)
+    ).first()
     if refresh_token:
         refresh_token.is_revoked = True
         db.commit()